@@ -2,13 +2,15 @@ import os
 from decimal import Decimal
 from typing import Optional
 
-import requests
+from fastapi import Request
+from fastapi.responses import JSONResponse
 from fastapi_amis_admin.admin import admin
 from fastapi_amis_admin.admin.settings import Settings
 from fastapi_amis_admin.admin.site import AdminSite
 from fastapi_amis_admin.amis import PageSchema
 from models import Course, Grade, Update, User
 from sqlmodel import Field, Relationship, SQLModel
+from utils.route import is_admin
 
 try:
     db_url = os.getenv("DB_URL", "")
@@ -19,6 +21,13 @@ try:
         )
     )
 
+    # * sub-app middleware: only runs for `/admin`, and also guards its mounts (e.g. `/upload`)
+    @site.fastapi.middleware("http")
+    async def admin_auth(request: Request, call_next):
+        if not is_admin(request.cookies.get("admin")):
+            return JSONResponse("You don't belong here 👻", status_code=401)
+        return await call_next(request)
+
     models: list[SQLModel] = [User, Grade, Update]
 
     # for model in models:
@@ -57,14 +66,12 @@ try:
         link = f'{os.getenv("APP_URL", "")}/backup'
         page_schema = PageSchema(label="Backup", icon="fa-solid fa-download")  # type: ignore
 
-    if api_key := os.getenv("APP_ANALYTICS_KEY"):
-        user_id = requests.get(f"https://www.apianalytics-server.com/api/user-id/{api_key}").text
-        user_id = user_id[1:-1].replace("-", "")  # get rid of quote
-        url = f"https://www.apianalytics.dev/dashboard/{user_id}"
+    # * `/analytics` redirects to the dashboard with the user id fetched once at startup
+    if os.getenv("APP_ANALYTICS_KEY"):
 
         @site.register_admin
         class AnalyticsAdmin(admin.LinkAdmin):
-            link = url
+            link = f'{os.getenv("APP_URL", "")}/analytics'
             page_schema = PageSchema(label="Analytics", icon="fa-solid fa-chart-simple")  # type: ignore
 
 except Exception as e:
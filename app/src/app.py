@@ -4,7 +4,7 @@ from contextlib import asynccontextmanager
 from typing import Annotated
 from urllib.parse import quote
 
-import requests
+import aiohttp
 import uvicorn
 from api_analytics.fastapi import Analytics
 from auth import get_token
@@ -18,6 +18,7 @@ from errors import (
     ValidationErrorResponse,
 )
 from fastapi import (
+    APIRouter,
     Cookie,
     Depends,
     FastAPI,
@@ -29,27 +30,36 @@ from fastapi import (
 )
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse
 from models import (
     Course,
+    CourseBase,
     CourseReadWithGrade,
     GradeWithSegments,
     Id1,
     SemesterStr,
     StudentId,
     User,
+    validate_semester,
 )
 from routes import get_routers
 from routes.submit import parse_page
 from sqlalchemy import text
 from sqlmodel import Session, select
 from utils.grade import get_grade_element
-from utils.route import APP_MODE, admin_required, is_admin, test_only, wrap_router
+from utils.route import (
+    APP_MODE,
+    admin_required,
+    is_admin,
+    require_admin,
+    test_only,
+    wrap_router,
+)
 from utils.static import get_static_path
 from utils.validate_env import validate_env
 
-load_dotenv(os.path.join(os.path.dirname(__file__), "../../.env"), override=True)
+ENV_PATH = os.path.join(os.path.dirname(__file__), "../../.env")
+load_dotenv(ENV_PATH, override=True)
 
 if os.getenv("APP_MODE") == "DEV":
     os.environ["APP_URL"] = "http://localhost:5000"
@@ -68,7 +78,15 @@ async def lifespan(app: FastAPI):
     else:
         logger.info("Checked .env file, up-to-date.")
 
-    yield
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        app.state.http_session = session
+
+        # * the user id never changes for a key, fetch it once instead of on every `/analytics`
+        app.state.analytics_user_id = None
+        if api_key := os.getenv("APP_ANALYTICS_KEY"):
+            app.state.analytics_user_id = await fetch_analytics_user_id(session, api_key)
+
+        yield
 
 
 app = FastAPI(
@@ -82,7 +100,8 @@ app = FastAPI(
 )
 wrap_router(app.router)
 
-app.mount("/static", StaticFiles(directory=get_static_path()), name="static")
+# * routes under `/admin` and `/static`, the amis admin site guards itself in admin.py
+admin_router = APIRouter(dependencies=[Depends(require_admin)])
 
 app.add_middleware(
     CORSMiddleware,
@@ -108,16 +127,30 @@ def get_course(*, session: Session = Depends(get_session), id1: Id1) -> CourseRe
     course = session.exec(select(Course).where(Course.id1 == id1)).one_or_none()
     if not course:
         raise HTTPException(404)
-    grades = [GradeWithSegments.model_validate(get_grade_element(g)) for g in course.grades]
-    return CourseReadWithGrade(**course.model_dump(), grades=grades)
+    # * elements are validated when built, no need to validate them again
+    elements = [e for e in map(get_grade_element, course.grades) if e]
+    grades = [
+        GradeWithSegments.model_construct(
+            **{k: getattr(e, k) for k in GradeWithSegments.model_fields}
+        )
+        for e in elements
+    ]
+    return CourseReadWithGrade.model_construct(
+        **{k: getattr(course, k) for k in CourseBase.model_fields}, grades=grades
+    )
 
 
 # ---------------------------------- Config ---------------------------------- #
 
 
+# * read once, use `/admin/reload-config` to pick up changes
+_CONFIG_SEMESTER = os.getenv("CONFIG_SEMESTER", "111-2")
+_CONFIG_TTL = int(os.getenv("CONFIG_TTL", 1800))
+
+
 @app.get("/semester")
 def get_semester() -> SemesterStr:
-    return os.getenv("CONFIG_SEMESTER", "111-2")
+    return _CONFIG_SEMESTER
 
 
 @app.get("/time-to-live")
@@ -125,8 +158,27 @@ def get_TTL() -> int:
     """
     Time-to-live in seconds.
     """
-    ttl = int(os.getenv("CONFIG_TTL", 1800))
-    return ttl
+    return _CONFIG_TTL
+
+
+@admin_router.post("/admin/reload-config")
+def reload_config() -> dict[str, str | int]:
+    """
+    Re-read `CONFIG_*` and `APP_ADMIN` from .env and environment variables.
+    Nothing is changed if any `CONFIG_*` is invalid.
+    """
+    global _CONFIG_SEMESTER, _CONFIG_TTL
+    load_dotenv(ENV_PATH, override=True)
+    is_admin.cache_clear()  # APP_ADMIN may be rotated
+
+    try:
+        semester = validate_semester(os.getenv("CONFIG_SEMESTER", "111-2"))
+        ttl = int(os.getenv("CONFIG_TTL", 1800))
+    except ValueError as e:
+        raise HTTPException(422, f"Invalid config: {e}")
+
+    _CONFIG_SEMESTER, _CONFIG_TTL = semester, ttl
+    return {"semester": _CONFIG_SEMESTER, "ttl": _CONFIG_TTL}
 
 
 # ----------------------------------- Test ----------------------------------- #
@@ -209,12 +261,31 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 # ---------------------------------- Utility --------------------------------- #
 
 
+async def fetch_analytics_user_id(session: aiohttp.ClientSession, api_key: str) -> str | None:
+    try:
+        async with session.get(f"https://www.apianalytics-server.com/api/user-id/{api_key}") as r:
+            r.raise_for_status()
+            user_id = await r.text()
+    except (aiohttp.ClientError, TimeoutError) as e:
+        logging.getLogger("uvicorn").error(f"Failed to fetch analytics user id: {e}")
+        return None
+
+    user_id = user_id[1:-1].replace("-", "")  # get rid of quote
+    # ? the id is cached for the whole process, never keep something that is not an id
+    if not user_id.isalnum():
+        logging.getLogger("uvicorn").error(f"Unexpected analytics user id: {user_id!r}")
+        return None
+    return user_id
+
+
 @app.get("/analytics")
 @admin_required
-def get_analytics():
-    if api_key := os.getenv("APP_ANALYTICS_KEY"):
-        user_id = requests.get(f"https://www.apianalytics-server.com/api/user-id/{api_key}").text
-        user_id = user_id[1:-1].replace("-", "")  # get rid of quote
+async def get_analytics():
+    if not app.state.analytics_user_id and (api_key := os.getenv("APP_ANALYTICS_KEY")):
+        # * fetch at startup failed, try again
+        app.state.analytics_user_id = await fetch_analytics_user_id(app.state.http_session, api_key)
+
+    if user_id := app.state.analytics_user_id:
         url = f"https://www.apianalytics.dev/dashboard/{user_id}"
         return RedirectResponse(url)
 
@@ -230,6 +301,18 @@ def get_dialog():
     return
 
 
+@admin_router.api_route("/static/{file_path:path}", methods=["GET", "HEAD"])
+def get_static(file_path: str):
+    static_path = get_static_path().resolve()
+    full_path = (static_path / file_path).resolve()
+    if static_path not in full_path.parents or not full_path.is_file():
+        raise HTTPException(404)
+    return FileResponse(full_path)
+
+
+# ? must be included after all admin routes are declared, and before the site is mounted
+app.include_router(admin_router, include_in_schema=False)
+
 from admin import site
 
 if site:
@@ -238,19 +321,6 @@ else:
     print("no site QQ")
 
 
-ADMIN_PATHS = ["/admin", "/static"]
-
-
-@app.middleware("http")
-async def admin_auth(request: Request, call_next):
-    if any(request.url.path.startswith(path) for path in ADMIN_PATHS):
-        # and APP_MODE == 'PROD':
-        if not is_admin(request.cookies.get("admin")):
-            return JSONResponse("You don't belong here 👻", status_code=401)
-    response = await call_next(request)
-    return response
-
-
 # ----------------------------------- Main ----------------------------------- #
 
 PORT = int(os.getenv("PORT_DEV", 4000))
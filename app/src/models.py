@@ -1,7 +1,8 @@
 import hashlib
 import math
-import re
 from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+from itertools import accumulate
 from typing import Annotated, Optional, Self, TypeAlias
 
 from fastapi.exceptions import RequestValidationError
@@ -12,7 +13,7 @@ from pydantic import (
     field_validator,
     model_validator,
 )
-from sqlalchemy import ForeignKeyConstraint, PrimaryKeyConstraint, UniqueConstraint
+from sqlalchemy import ForeignKeyConstraint, PrimaryKeyConstraint, UniqueConstraint, event
 from sqlmodel import Field, Relationship, SQLModel
 
 # todo: split specific model to corresponding routing file
@@ -41,10 +42,10 @@ Id2: TypeAlias = Annotated[
 
 
 def validate_semester(s: str):
-    a, b = list(map(int, s.split("-")))
-    if 130 >= a >= 90 and 2 >= b >= 1:
+    a, _, b = s.partition("-")
+    if a.isdecimal() and b.isdecimal() and 130 >= int(a) >= 90 and 2 >= int(b) >= 1:
         return s
-    raise ValidationError()
+    raise ValueError(f"Invalid semester: {s}")
 
 
 SemesterStr = Annotated[
@@ -66,8 +67,9 @@ ClassId = Annotated[str, Field(description="'班次'", schema_extra={"examples":
 
 # A+: 9, A: 8, ..., F: 0
 GRADES = ("F", "C-", "C", "C+", "B-", "B", "B+", "A-", "A", "A+")
-GRADE_MAP = {grade: i for grade, i in enumerate(GRADES)}
-GRADE_MAP_INV = {i: grade for grade, i in enumerate(GRADES)}
+INT_TO_GRADE = GRADES  # already ordered by grade int, no need to reverse
+GRADE_TO_INT = {grade: i for i, grade in enumerate(INT_TO_GRADE)}
+GRADES_SET: frozenset[str] = frozenset(GRADES)
 
 GradeInt: TypeAlias = Annotated[
     int,
@@ -80,7 +82,7 @@ GradeInt: TypeAlias = Annotated[
 
 
 def validate_grade_str(s: str):
-    if s in GRADES:
+    if s in GRADES_SET:
         return s
     raise ValidationError()
 
@@ -121,11 +123,28 @@ class Segment(BaseModel):
         return self.r - self.l + 1
 
 
+def validate_segments(v: list[Segment]):
+    """
+    Check that segments are adjacent and (nearly) sum up to 100, in one pass.
+    """
+
+    total = Decimal(0)
+    prev_r = v[0].l - 1 if v else -1
+    for seg in v:
+        if seg.l != prev_r + 1:
+            raise ValueError(f"Segments are not adjacent: {v}")
+        total += seg.value
+        prev_r = seg.r
+    if not math.isclose(total, 100, abs_tol=1):
+        raise ValueError(f"sum = {total}")
+    return v
+
+
 # * User
 
 
 def validate_student_id(id: str):
-    if re.match(r"[a-zA-Z0-9]{9}", id):
+    if len(id) == 9 and id.isascii() and id.isalnum():
         return id.capitalize()
     raise RequestValidationError([])  # TODO: is this error suitable?
 
@@ -138,6 +157,16 @@ StudentId = Annotated[
 # ------------------------------- Table Schema ------------------------------- #
 
 
+@lru_cache(maxsize=4096)
+def _grade_id(course_id1: str, course_id2: str, semester: str, class_id: str) -> int:
+    # * same string as `repr` of the 4-tuple, so ids stay unchanged
+    return int.from_bytes(
+        hashlib.sha256(
+            f"({course_id1!r}, {course_id2!r}, {semester!r}, {class_id!r})".encode()
+        ).digest()[:3]
+    )
+
+
 class CourseBase(SQLModel):
     id1: str = Field()
     id2: str = Field()
@@ -174,18 +203,13 @@ class GradeBase(SQLModel):
     # * Do the composite key ourself
     @staticmethod
     def get_id(grade: "GradeBase") -> int:
-        return int.from_bytes(
-            hashlib.sha256(
-                repr((grade.course_id1, grade.course_id2, grade.semester, grade.class_id)).encode()
-            ).digest()[:3]
-        )
+        return _grade_id(grade.course_id1, grade.course_id2, grade.semester, grade.class_id)
 
+    # ? ids read from db are trusted, only compute the missing ones
     @model_validator(mode="after")
     def check_passwords_match(self) -> "Self":
         if not self.id:
             self.id = GradeBase.get_id(self)
-        elif self.id != GradeBase.get_id(self):
-            raise ValueError("Invalid grade.id")
         return self
 
 
@@ -202,6 +226,13 @@ class Grade(GradeBase, table=True):
     )
 
 
+# * table models skip validators, so fill the id here when it is not given
+@event.listens_for(Grade, "before_insert")
+def set_grade_id(mapper, connection, target: Grade):
+    if not target.id:
+        target.id = Grade.get_id(target)
+
+
 class GradeElement(GradeBase):
     """
     Grade element stored in db and consumed by client. The values are between 0~100.
@@ -214,11 +245,7 @@ class GradeElement(GradeBase):
 
     @field_validator("segments")
     def valiadte_grade_eles(cls, v: list[Segment]):
-        if not math.isclose(sum(grade.value for grade in v), 100, abs_tol=1):
-            raise Exception(f"sum = {sum(grade.value for grade in v)}")
-        for i in range(len(v) - 1):
-            assert v[i].r + 1 == v[i + 1].l, v
-        return v
+        return validate_segments(v)
 
 
 # todo: I really want to change this to `record`
@@ -237,6 +264,13 @@ class GradeWithUpdate(GradeBase):
     course: "CourseBase"
     update: "UpdateBase"
 
+    # * submitted by user, so the given id must match
+    @model_validator(mode="after")
+    def check_id(self) -> "Self":
+        if self.id != GradeBase.get_id(self):
+            raise ValueError("Invalid grade.id")
+        return self
+
 
 class Update(UpdateBase, table=True):
     id: Optional[int] = Field(primary_key=True, default=None)
@@ -252,11 +286,7 @@ class GradeWithSegments(GradeBase):
 
     @field_validator("segments")
     def valiadte_grade_eles(cls, v: list[Segment]):
-        if not math.isclose(sum(grade.value for grade in v), 100, abs_tol=1):
-            raise Exception(f"sum = {sum(grade.value for grade in v)}")
-        for i in range(len(v) - 1):
-            assert v[i].r + 1 == v[i + 1].l, v
-        return v
+        return validate_segments(v)
 
 
 class CourseReadWithGrade(CourseBase):
@@ -276,6 +306,10 @@ class User(SQLModel, table=True):
 # ----------------------------------- Page ----------------------------------- #
 
 
+# ? the sampled indices are prefix sums of MAGIC modulo len(content), keep in sync with extension
+_MAGIC_PREFIX_SUMS = tuple(accumulate(map(ord, "TH3_M5G1C_OF_NTU" * 3)))
+
+
 class Page(BaseModel):
     """
     Page submitted by user.
@@ -290,19 +324,10 @@ class Page(BaseModel):
         Generate hashcode for page content.
         """
 
-        MAGIC = "TH3_M5G1C_OF_NTU" * 3
-        magic_idx = []
-        cur = 0
-        for m in MAGIC:
-            cur += ord(m)
-            cur %= len(content)
-            magic_idx.append(cur)
-
+        n = len(content)
         h = 0
-        a = []
-        for c in [content[idx] for idx in magic_idx]:
-            a.append(ord(c))
-            h = (h << 5) - h + ord(c)
+        for p in _MAGIC_PREFIX_SUMS:
+            h = (h << 5) - h + ord(content[p % n])
 
             h &= 1 << 63 - 1
         return h
@@ -13,7 +13,7 @@ from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response
 from fastapi.exceptions import RequestValidationError
 
 # from models import (
-#     GRADE_MAP_INV,
+#     GRADE_TO_INT,
 #     GRADES,
 #     Course,
 #     GradeElement,
@@ -261,7 +261,7 @@ def parse_page(text: str) -> tuple[str, list[GradeWithUpdate]]:
         # if not class_id:
         #     class_id = None
 
-        if grade_str not in GRADES:
+        if grade_str not in GRADES_SET:
             continue
 
         # ! fuck bs4 typing
@@ -284,7 +284,7 @@ def parse_page(text: str) -> tuple[str, list[GradeWithUpdate]]:
             continue
 
         course = CourseBase(**extract_dict(["id1", "id2", "title"], locals()))
-        update = UpdateBase(pos=GRADE_MAP_INV[grade_str], lower=dist[0], higher=dist[-1])
+        update = UpdateBase(pos=GRADE_TO_INT[grade_str], lower=dist[0], higher=dist[-1])
         grade = GradeWithUpdate(
             course_id1=id1,
             course_id2=id2,
@@ -1,6 +1,6 @@
 import os
-from functools import wraps
-from inspect import Parameter, signature
+from functools import lru_cache, wraps
+from inspect import Parameter, iscoroutinefunction, signature
 from typing import Annotated
 
 from fastapi import APIRouter, Cookie, FastAPI, HTTPException
@@ -45,18 +45,40 @@ def add_decorator_doc(dec):
     return _dec
 
 
-def is_admin(admin: str | None):
-    return (admin_token := os.getenv("APP_ADMIN")) and admin == admin_token
+# ? call `is_admin.cache_clear()` whenever APP_ADMIN changes
+@lru_cache(maxsize=1024)
+def is_admin(admin: str | None) -> bool:
+    return bool((admin_token := os.getenv("APP_ADMIN")) and admin == admin_token)
+
+
+def require_admin(admin: Annotated[str | None, Cookie()] = None):
+    """
+    Dependency for admin-only routers, unlike `admin_required` this also applies in DEV.
+    """
+    if not is_admin(admin):
+        raise HTTPException(401, "You don't belong here 👻")
 
 
 def admin_required(f):
 
-    @wraps(f)
-    def _f(admin: str, *args, **kwargs):
+    def check(admin: str):
         if APP_MODE == "PROD" and not is_admin(admin):
             raise HTTPException(401, "Fxxk off 🤬")
 
-        return f(*args, **kwargs)
+    # ? keep async handlers async, otherwise fastapi runs them in threadpool and gets a coroutine
+    if iscoroutinefunction(f):
+
+        @wraps(f)
+        async def _f(admin: str, *args, **kwargs):  # type: ignore
+            check(admin)
+            return await f(*args, **kwargs)
+
+    else:
+
+        @wraps(f)
+        def _f(admin: str, *args, **kwargs):
+            check(admin)
+            return f(*args, **kwargs)
 
     sig = signature(f)
     new_params = [
@@ -15,7 +15,7 @@ from typing import Generic, TypeVar
 #         raise NotImplementedError
 
 
-@dataclass
+@dataclass(slots=True)
 class Node:
     l: int
     r: int